@@ -0,0 +1 @@
+# Root conftest: makes pytest put the repository root on sys.path so tests can import extractor
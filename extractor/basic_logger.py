@@ -1,38 +1,71 @@
-from dataclasses import dataclass, asdict, field
+from dataclasses import dataclass, field
+from collections import deque
 import getpass
-from os import EX_CANTCREAT
+import os
 import platform
 import random
 import socket
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 from datetime import datetime, timezone
-import json
+import msgpack
+import orjson
 import threading
 import uuid
 import mss
+from PIL import Image
 import pygetwindow as gw
 from pynput import mouse, keyboard
 import gzip
 import shutil
 import requests
-
-@dataclass
+from requests.adapters import HTTPAdapter
+
+# Win32 constants for the active window event hooks
+_EVENT_SYSTEM_FOREGROUND = 0x0003
+_EVENT_SYSTEM_MOVESIZESTART = 0x000A
+_EVENT_SYSTEM_MOVESIZEEND = 0x000B
+_EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+_EVENT_OBJECT_NAMECHANGE = 0x800C
+_OBJID_WINDOW = 0
+_WINEVENT_OUTOFCONTEXT = 0x0000
+_PM_NOREMOVE = 0x0000
+_WM_QUIT = 0x0012
+
+# Max buffers per os.writev call, 0 where writev is not available (Windows)
+if hasattr(os, "writev"):
+    try:
+        _IOV_MAX = os.sysconf("SC_IOV_MAX")
+    except (ValueError, OSError):
+        _IOV_MAX = -1
+    # -1 means "no fixed limit" (or unknown), use the common Linux/BSD limit
+    if _IOV_MAX <= 0:
+        _IOV_MAX = 1024
+else:
+    _IOV_MAX = 0
+
+# Log file extension per log_format
+_LOG_SUFFIXES = {"jsonl": ".jsonl", "msgpack": ".msgpack"}
+
+_NO_WINDOW = {"window_title": None, "window_width": None, "window_height": None}
+
+
+def _msgpack_map_header(size: int) -> bytes:
+    if size <= 15:
+        return bytes((0x80 | size,))
+    return b"\xde" + size.to_bytes(2, "big")
+
+@dataclass(slots=True)
 class Event:
+    """Shape of one record in the session log file (.jsonl line or msgpack object)"""
     session_id: str
     timestamp: str
     event_type: str
     data: Dict[str, Any]
 
-    def to_dict(self):
-        return asdict(self)
-    
-    def to_json(self) -> str:
-        return json.dumps(asdict(self))
-    
 
-@dataclass
+@dataclass(slots=True)
 class SessionMetadata:
     session_id: str
     start_time_utc: str
@@ -46,22 +79,56 @@ class ActivityObserver:
     output_logs_dir:Path = Path("./activity/logs")
     output_screenshots_dir:Path = Path("./activity/screenshots")
     _CAPTURES_PER_HOUR:int = field(init=False, default=4)
+    _SECONDS_PER_HOUR:int = field(init=False, default=3600)
 
     upload_interval_seconds: int = 30  # 5 minutes
     backend_url: str = "http://localhost:8000/generate-upload-url"
 
+    # rotated files are uploaded together once this many are pending or the oldest is this old.
+    # Default uploads every rotation right away, batching only picks up files left by failed uploads
+    upload_batch_files: int = 1
+    upload_batch_max_age: int = 120 # In seconds
+
+    # "jsonl" or "msgpack" (smaller and cheaper to write, read back with msgpack.Unpacker)
+    log_format: str = "jsonl"
+
     mouse_throttle_ms: int = 250 # In ms so 4 events in 1 sec
     window_poll_interval: int = 1
 
+    # writer thread: events are queued by the listeners and written in batches
+    event_queue_size: int = 65536 # oldest events are dropped past this
+    writer_batch_size: int = 256
+    writer_flush_interval: float = 0.5 # In seconds
+
     session: Optional[SessionMetadata] = field(init=False, default=None)
     is_recording: bool = field(init=False, default=False)
     event_count: int = field(init=False, default=0)
 
     _lock: threading.Lock = field(init=False, default_factory=threading.Lock)
-    _log_file: Optional[Any] = field(init=False, default=None)
-
-    _current_window: Dict[str, Any] = field(init=False, default_factory=dict)
-    _last_mouse_time: float = field(init=False, default=0.0)
+    _log_fd: Optional[int] = field(init=False, default=None)
+    # (path, fd) of the already opened file the next rotation switches to
+    _next_log: Optional[tuple] = field(init=False, default=None)
+    _event_dq: Optional[deque] = field(init=False, default=None)
+    _new_event: threading.Event = field(init=False, default_factory=threading.Event)
+    _writer_thread: Optional[threading.Thread] = field(init=False, default=None)
+    _upload_thread: Optional[threading.Thread] = field(init=False, default=None)
+
+    _current_window: Dict[str, Any] = field(init=False, default_factory=lambda: dict(_NO_WINDOW))
+    # (left, top, width, height) of the active window, not logged, used to crop screenshots
+    _window_rect: Optional[tuple] = field(init=False, default=None)
+    # foreground window is being dragged/resized, refresh once when it ends
+    _in_move_size: bool = field(init=False, default=False)
+    # constant parts of every event record, encoded once per session in start()
+    _line_prefix: bytes = field(init=False, default=b"")
+    _type_fragments: Dict[str, bytes] = field(init=False, default_factory=dict)
+
+    # _current_window pre-serialized without its map header/braces, spliced into every event's data
+    _window_suffix: bytes = field(init=False, default=b"")
+    _last_mouse_ns: int = field(init=False, default=0)
+    _throttle_ns: int = field(init=False, default=0)
+
+    # (second, "YYYY-MM-DDTHH:MM:SS") of the last event timestamp, only used by the writer thread
+    _ts_cache: tuple = field(init=False, default=(-1, ""))
 
     # cursor_position
     _last_cursor_pos:tuple = field(init=False, default=(0,0)) 
@@ -69,51 +136,113 @@ class ActivityObserver:
     # threading stop event
     _stop_event: threading.Event = field(init=False, default_factory=threading.Event)
 
+    # keep-alive HTTP session reused across uploads
+    _http: Optional[requests.Session] = field(init=False, default=None)
+
+    # compressed files waiting to be uploaded, guarded by _upload_lock
+    _pending_uploads: List[Path] = field(init=False, default_factory=list)
+    _pending_since: float = field(init=False, default=0.0)
+    _upload_lock: threading.Lock = field(init=False, default_factory=threading.Lock)
+
 
     def __post_init__(self):
+        if self.log_format not in _LOG_SUFFIXES:
+            raise ValueError(f"Unknown log_format: {self.log_format}")
+
         self.output_logs_dir.mkdir(parents=True,exist_ok=True)
         self.output_screenshots_dir.mkdir(parents=True,exist_ok=True)
+        self._throttle_ns = self.mouse_throttle_ms * 1_000_000
+
+        # Backend + storage host only, so a small pool is enough
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
 
     def _utc_now(self) -> str:
         """Get UTC time now"""
         return datetime.now(timezone.utc).isoformat()
+
+    def _fast_ts(self, ns: int) -> str:
+        """Format a time.time_ns() value like _utc_now, the date part is only formatted once per second"""
+        sec, us = divmod(ns // 1000, 1_000_000)
+
+        cached_sec, prefix = self._ts_cache
+        if sec != cached_sec:
+            prefix = datetime.fromtimestamp(sec, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+            self._ts_cache = (sec, prefix)
+
+        return f"{prefix}.{us:06d}+00:00"
     
 
-    def _take_screenshot(self):
+    def _window_region(self, bounds: Dict[str, int]) -> Optional[Dict[str, int]]:
+        """Active window rectangle clipped to the screen bounds, None if there is nothing to grab"""
+        if self._window_rect is None:
+            return None
+
+        win_left, win_top, win_width, win_height = self._window_rect
+
+        # Clip so partly off-screen (or minimized, e.g. -32000 on Windows) windows are handled
+        left = max(win_left, bounds["left"])
+        top = max(win_top, bounds["top"])
+        right = min(win_left + win_width, bounds["left"] + bounds["width"])
+        bottom = min(win_top + win_height, bounds["top"] + bounds["height"])
+
+        if right <= left or bottom <= top:
+            return None
+
+        return {"left": left, "top": top, "width": right - left, "height": bottom - top}
+
+    def _take_screenshot(self, sct, screen: Dict[str, int], monitor_rects: List[tuple]):
+        """screen is the all-monitors area, monitor_rects (left, top, right, bottom, monitor) per monitor"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = self.output_screenshots_dir / f"screenshot_{timestamp}.png"
 
+        # Grab only the active window, far fewer pixels to encode than a whole monitor
+        region = self._window_region(screen)
+        if region is not None:
+            self._save_png(sct.grab(region), filename)
+            return
+
         # get the cursor position
         cursor_x, cursor_y = self._last_cursor_pos
 
-        with mss.mss() as sct:
-            monitors = sct.monitors
-            selected_monitor = None
+        selected_monitor = screen
 
-            for monitor in monitors[1:]:
-                left = monitor["left"]
-                top = monitor["top"]
-                width = monitor["width"]
-                height = monitor["height"]
+        for left, top, right, bottom, monitor in monitor_rects:
+            if left <= cursor_x < right and top <= cursor_y < bottom:
+                selected_monitor = monitor
+                break
+        
+        self._save_png(sct.grab(selected_monitor), filename)
 
-                if (left <= cursor_x < left + width) and (top <= cursor_y < top + height):
-                    selected_monitor = monitor
-                    break
-            
-            if selected_monitor is None:
-                selected_monitor = monitors[0]
-            
-            img = sct.grab(selected_monitor)
-            mss.tools.to_png(img.rgb, img.size, output=str(filename))
-            
+    def _save_png(self, img, filename: Path):
+        # Pillow's libpng encoder, reading the raw BGRA buffer directly
+        # (skips mss' pure-Python RGB conversion). Level 1 trades file size for speed.
+        Image.frombytes("RGB", img.size, img.bgra, "raw", "BGRX").save(
+            str(filename), "PNG", compress_level=1
+        )
+        
         # print(f"Screenshot saved: {filename}")
     
+    def _capture_screenshot(self):
+        # mss caches the monitor layout per instance, so use a fresh one per capture to pick up
+        # plugged/unplugged monitors and resolution changes. At a few captures an hour its setup is negligible
+        with mss.mss() as sct:
+            # plain bounds for the cursor lookup
+            screen = sct.monitors[0]
+            monitor_rects = [
+                (m["left"], m["top"], m["left"] + m["width"], m["top"] + m["height"], m)
+                for m in sct.monitors[1:]
+            ]
+            self._take_screenshot(sct, screen, monitor_rects)
+
     def _screenshot_scheduler(self):
         print("Screenshot scheduler started:", self._stop_event)
         while not self._stop_event.is_set():
 
-            # Generate 6 random seconds inside the next hour
-            random_times = sorted(random.sample(range(20), self._CAPTURES_PER_HOUR))
+            # Generate _CAPTURES_PER_HOUR random seconds inside the next hour
+            random_times = sorted(random.sample(range(self._SECONDS_PER_HOUR), self._CAPTURES_PER_HOUR))
 
             hour_start = time.time()
 
@@ -128,36 +257,51 @@ class ActivityObserver:
                     self._stop_event.wait(sleep_time)
 
                 if not self._stop_event.is_set():
-                    self._take_screenshot()
+                    self._capture_screenshot()
 
             # Wait until full hour completes
-            remaining = hour_start + 20 - time.time()
+            remaining = hour_start + self._SECONDS_PER_HOUR - time.time()
             if remaining > 0:
                 self._stop_event.wait(remaining)
 
         print("Screenshot scheduler stopped.")
     
 
+    def _refresh_window(self):
+        """Read the active window into _current_window, _window_rect and _window_suffix"""
+        win = gw.getActiveWindow()
+
+        if win:
+            self._current_window = {
+                "window_title": win.title,
+                "window_width": win.width,
+                "window_height": win.height,
+            }
+            self._window_rect = (win.left, win.top, win.width, win.height)
+        else:
+            self._current_window = dict(_NO_WINDOW)
+            self._window_rect = None
+
+        # Serialize once per change instead of merging into every event
+        self._window_suffix = self._encode_window(self._current_window)
+
+    def _encode_window(self, window: Dict[str, Any]) -> bytes:
+        if self.log_format == "msgpack":
+            # Strip the fixmap header, _serialize_event writes the merged one
+            return msgpack.packb(window)[1:]
+        return orjson.dumps(window)[1:-1]
+
     def _window_monitor_loop(self):
         print("Window monitor started.")
 
+        # On Windows follow OS events, polling stays as the fallback
+        if platform.system() == "Windows" and self._window_event_loop():
+            print("Window monitor stopped.")
+            return
+
         while not self._stop_event.is_set():
             try:
-                win = gw.getActiveWindow()
-
-                if win:
-                    self._current_window = {
-                        "window_title": win.title,
-                        "window_width": win.width,
-                        "window_height": win.height,
-                    }
-                else:
-                    self._current_window = {
-                        "window_title": None,
-                        "window_width": None,
-                        "window_height": None
-                    }
-
+                self._refresh_window()
             except Exception:
                 pass
 
@@ -165,11 +309,126 @@ class ActivityObserver:
             self._stop_event.wait(self.window_poll_interval)
 
         print("Window monitor stopped.")
+
+    def _on_win_event(self, user32, event: int, hwnd, id_object: int):
+        """WinEvent hook callback, refreshes the active window when the event concerns it"""
+        if event == _EVENT_SYSTEM_FOREGROUND:
+            self._in_move_size = False
+        elif event == _EVENT_SYSTEM_MOVESIZESTART:
+            # A drag/resize sends location changes continuously, wait for its end
+            self._in_move_size = True
+            return
+        elif event == _EVENT_SYSTEM_MOVESIZEEND:
+            self._in_move_size = False
+        elif event in (_EVENT_OBJECT_LOCATIONCHANGE, _EVENT_OBJECT_NAMECHANGE):
+            # These fire for every object of the foreground app (controls, caret...),
+            # only the foreground window itself matters
+            if id_object != _OBJID_WINDOW or hwnd != user32.GetForegroundWindow():
+                return
+            if event == _EVENT_OBJECT_LOCATIONCHANGE and self._in_move_size:
+                return
+        try:
+            self._refresh_window()
+        except Exception:
+            pass
+
+    def _window_event_loop(self) -> bool:
+        """Refresh the active window on focus, title and move/resize/maximize events (Windows only).
+        Blocks until stop, returns False if the hooks could not be installed."""
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+
+        WinEventProc = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD
+        )
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.SetWinEventHook.argtypes = [
+            wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, WinEventProc,
+            wintypes.DWORD, wintypes.DWORD, wintypes.DWORD
+        ]
+        user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+        user32.GetForegroundWindow.restype = wintypes.HWND
+        user32.GetWindowThreadProcessId.restype = wintypes.DWORD
+        user32.GetWindowThreadProcessId.argtypes = [wintypes.HWND, ctypes.POINTER(wintypes.DWORD)]
+
+        # Hooks scoped to the thread owning the foreground window, moved on every focus change,
+        # so mouse/caret activity of other apps never calls back into Python
+        window_hooks = []
+
+        def hook_foreground_window():
+            for hook in window_hooks:
+                user32.UnhookWinEvent(hook)
+            window_hooks.clear()
+
+            hwnd = user32.GetForegroundWindow()
+            if not hwnd:
+                return
+
+            process_id = wintypes.DWORD()
+            thread_id = user32.GetWindowThreadProcessId(hwnd, ctypes.byref(process_id))
+            for first, last in ((_EVENT_SYSTEM_MOVESIZESTART, _EVENT_SYSTEM_MOVESIZEEND),
+                                (_EVENT_OBJECT_LOCATIONCHANGE, _EVENT_OBJECT_NAMECHANGE)):
+                hook = user32.SetWinEventHook(
+                    first, last, None, proc, process_id.value, thread_id, _WINEVENT_OUTOFCONTEXT
+                )
+                if hook:
+                    window_hooks.append(hook)
+
+        def on_win_event(hook, event, hwnd, id_object, id_child, event_thread, event_time):
+            # Hooks are called on this thread's message loop, so re-hooking here is safe
+            if event == _EVENT_SYSTEM_FOREGROUND:
+                hook_foreground_window()
+            self._on_win_event(user32, event, hwnd, id_object)
+
+        # Keep a reference to the ctypes callback for as long as the hooks live
+        proc = WinEventProc(on_win_event)
+        hooks = [
+            user32.SetWinEventHook(
+                _EVENT_SYSTEM_FOREGROUND, _EVENT_SYSTEM_FOREGROUND, None, proc, 0, 0, _WINEVENT_OUTOFCONTEXT
+            )
+        ]
+
+        try:
+            if not all(hooks):
+                return False
+
+            hook_foreground_window()
+
+            try:
+                self._refresh_window()
+            except Exception:
+                pass
+
+            # Make sure this thread has a message queue before anyone posts WM_QUIT to it
+            msg = wintypes.MSG()
+            user32.PeekMessageW(ctypes.byref(msg), None, 0, 0, _PM_NOREMOVE)
+            thread_id = kernel32.GetCurrentThreadId()
+
+            # GetMessageW blocks, wake it up with WM_QUIT once stop() is called
+            def quit_on_stop():
+                self._stop_event.wait()
+                user32.PostThreadMessageW(thread_id, _WM_QUIT, 0, 0)
+
+            threading.Thread(target=quit_on_stop, daemon=True).start()
+
+            # Out of context hooks are delivered through this thread's message loop
+            while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+
+            return True
+        finally:
+            for hook in hooks + window_hooks:
+                if hook:
+                    user32.UnhookWinEvent(hook)
     
     def _get_active_window(self) -> Dict[str,Any]:
         """Get Active Window Info"""
         try:
-            import pygetwindow as gw
             win = gw.getActiveWindow()
 
             if win:
@@ -198,15 +457,42 @@ class ActivityObserver:
             hostname=socket.gethostname(),
             username=getpass.getuser(),
             os=f"{platform.system()} {platform.release()}",
-            output_file=str(self.output_logs_dir / f"session_{session_id}.jsonl")
+            output_file=str(self.output_logs_dir / f"session_{session_id}{_LOG_SUFFIXES[self.log_format]}")
         )
 
         print(self.session.hostname, self.session.username, self.session.os)
 
-        self._log_file = open(self.session.output_file, "a", encoding = "utf-8", buffering = 1)
-        self.is_recording = True
+        # Event records only differ by timestamp and data, pre-encode the rest
+        event_types = ("mouse_move", "mouse_click", "mouse_scroll", "key_press")
+        if self.log_format == "msgpack":
+            pack = msgpack.packb
+            self._line_prefix = _msgpack_map_header(4) + pack("session_id") + pack(session_id) + pack("timestamp")
+            self._type_fragments = {
+                event_type: pack("event_type") + pack(event_type) + pack("data")
+                for event_type in event_types
+            }
+        else:
+            self._line_prefix = b'{"session_id":' + orjson.dumps(session_id) + b',"timestamp":"'
+            self._type_fragments = {
+                event_type: b'","event_type":' + orjson.dumps(event_type) + b',"data":'
+                for event_type in event_types
+            }
+        self._window_suffix = self._encode_window(self._current_window)
+
+        self._log_fd = self._open_log(self.session.output_file)
+        self._prepare_next_log()
         self.event_count = 0
 
+        # Start Writer Thread (the only thread writing to the log file):
+        self._event_dq = deque(maxlen=self.event_queue_size)
+        self._new_event.clear()
+        self._writer_thread = threading.Thread(
+            target=self._writer_loop,
+            daemon=True
+        )
+        self._writer_thread.start()
+        self.is_recording = True
+
         # Start Window Monitor Thread:
         window_thread = threading.Thread(
             target=self._window_monitor_loop,
@@ -222,11 +508,11 @@ class ActivityObserver:
         screenshot_thread.start()
 
         # File uploading thread
-        upload_file_thread = threading.Thread(
+        self._upload_thread = threading.Thread(
             target=self._upload_scheduler,
             daemon=True
         )
-        upload_file_thread.start()
+        self._upload_thread.start()
 
 
         self.mouse_listener = mouse.Listener(
@@ -255,20 +541,36 @@ class ActivityObserver:
 
         self._stop_event.set()
 
+        # A rotation in progress owns _log_fd/_next_log until it is done
+        self._upload_thread.join()
+
+        # Let the writer drain whatever is still queued
+        self._event_dq.append(None)
+        self._new_event.set()
+        self._writer_thread.join()
 
         # Need to Upload last active file
         try:
             with self._lock:
-                if self._log_file:
-                    self._log_file.flush()
-                    self._log_file.close()
+                if self._log_fd is not None:
+                    self._close_log(self._log_fd)
+                    self._log_fd = None
 
                 final_file = Path(self.session.output_file)
 
+            # The pre-opened next file was never written to
+            if self._next_log is not None:
+                next_file, next_fd = self._next_log
+                self._next_log = None
+                os.close(next_fd)
+                next_file.unlink(missing_ok=True)
+
             # Upload outside lock
             if final_file.exists() and final_file.stat().st_size > 0:
-                print("Uploading final file before shutdown...")
-                self._upload_file(final_file)
+                self._add_pending_upload(self._compress_file(final_file))
+
+            print("Uploading pending files before shutdown...")
+            self._upload_pending(force=True)
         except Exception as e:
             print("Final Upload is failed :", e)
 
@@ -291,22 +593,30 @@ class ActivityObserver:
                 continue
 
             try:
+                if self._next_log is None:
+                    self._prepare_next_log()
+                new_file, new_fd = self._next_log
+                self._next_log = None
+
+                # Only swap to the pre-opened file under the lock, the writer never waits on open()
                 with self._lock:
                     # Save the current file
                     file_path = Path(self.session.output_file)
-                    
-                    # Close current file safely
-                    if self._log_file:
-                        self._log_file.flush()
-                        self._log_file.close()
-                    
-                    # Immediately open NEW file
-                    new_file = self.output_logs_dir / f"session_{uuid.uuid4()}.jsonl"
+                    old_fd = self._log_fd
+
+                    self._log_fd = new_fd
                     self.session.output_file = str(new_file)
-                    self._log_file = open(new_file, "a", encoding="utf-8", buffering=1)
 
-                # Upload outside lock (important!)
-                self._upload_file(file_path)
+                # Close current file safely, the writer already moved on to the new one
+                if old_fd is not None:
+                    self._close_log(old_fd)
+
+                # Have the file for the next rotation ready
+                self._prepare_next_log()
+
+                # Compress and upload outside lock (important!)
+                self._add_pending_upload(self._compress_file(file_path))
+                self._upload_pending()
                    
             except Exception as e:
                 print("Upload scheduler error:", e)
@@ -314,119 +624,294 @@ class ActivityObserver:
         print("Upload scheduler stopped.")
 
 
-    def _upload_file(self, file_path: Path):
+    def _compress_file(self, file_path: Path) -> Path:
+        """Gzip a closed log file next to itself and remove the raw file"""
+        gz_path = file_path.with_name(file_path.name + ".gz")
+
+        # Level 3 is the sweet spot for event logs: most of the ratio for a fraction of the CPU
+        with open(file_path, "rb") as src, gzip.open(gz_path, "wb", compresslevel=3) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+
+        file_path.unlink()
+        return gz_path
+
+    def _add_pending_upload(self, file_path: Path):
+        with self._upload_lock:
+            if not self._pending_uploads:
+                self._pending_since = time.monotonic()
+            self._pending_uploads.append(file_path)
+
+    def _upload_pending(self, force: bool = False):
+        """Upload pending files in one request once the batch is due (or always if force)"""
+        with self._upload_lock:
+            pending = [p for p in self._pending_uploads if p.exists()]
+            if not pending:
+                self._pending_uploads = []
+                return
+
+            if not force \
+                    and len(pending) < self.upload_batch_files \
+                    and time.monotonic() - self._pending_since < self.upload_batch_max_age:
+                self._pending_uploads = pending
+                return
+
+            if len(pending) == 1:
+                uploaded = self._upload_file(pending[0])
+            else:
+                # Concatenated gzip files are one valid multi-member gzip stream (RFC 1952)
+                # that decodes to the concatenated records, so the object format is unchanged
+                batch_path = self.output_logs_dir / f"batch_{uuid.uuid4()}{_LOG_SUFFIXES[self.log_format]}.gz"
+                with open(batch_path, "wb") as dst:
+                    for p in pending:
+                        with open(p, "rb") as src:
+                            shutil.copyfileobj(src, dst, 1024 * 1024)
+
+                uploaded = self._upload_file(batch_path)
+                if uploaded:
+                    for p in pending:
+                        p.unlink()
+                else:
+                    batch_path.unlink(missing_ok=True)
+
+            # Failed files stay pending and are retried with the next batch
+            self._pending_uploads = [] if uploaded else pending
+
+    def _upload_file(self, file_path: Path) -> bool:
         if not file_path.exists():
-            return
+            return False
 
         try:
             print(f"Uploading {file_path.name}")
 
             # Get presigned URL
-            response = requests.post(
+            response = self._http.post(
                 self.backend_url,
                 json={
                     "user_id": self.session.username,
-                    "session_id": self.session.session_id
+                    "session_id": self.session.session_id,
+                    # Both formats are uploaded gzipped, tell the backend which one this is
+                    "format": self.log_format,
+                    "file_name": file_path.name
                 }
             )
 
             if response.status_code != 200:
                 print("Failed to get presigned URL:", response.text)
-                return
+                return False
 
             upload_url = response.json()["upload_url"]
             print("upload_url:", upload_url)
 
-            file_bytes = file_path.read_bytes()
+            file_size = file_path.stat().st_size
 
-            # Upload RAW file directly
+            # Every upload is a gzipped log, single file or batch
+            headers = {
+                "Content-Length": str(file_size),
+                "Content-Encoding": "gzip"
+            }
+
+            # Stream the file, requests reads it in chunks instead of loading it in memory
             with open(file_path, "rb") as f:
-                upload_response = requests.put(
+                upload_response = self._http.put(
                     upload_url,
-                    data=file_bytes,
-                    headers={
-                        "Content-Length":str(len(file_bytes))
-                    }
+                    data=f,
+                    headers=headers
                 )
 
             if upload_response.status_code == 200:
                 print("Upload successful")
                 file_path.unlink()  # delete local file
-            else:
-                print("Upload failed:", upload_response.text)
+                return True
+
+            print("Upload failed:", upload_response.text)
 
         except Exception as e:
             print("Upload error:", e)
 
+        return False
+
     
-    def _write_event(self, event_type:str, payload:Dict[str, Any]):
+    def _write_event(self, event_type:str, *args):
         if not self.is_recording:
             return
-        
-        # Using threading: to protects shared writes
-        with self._lock:
-            event = Event(
-                session_id=self.session.session_id,
-                timestamp=self._utc_now(),
-                event_type=event_type,
-                data={**payload, **self._current_window}
-            )
 
-            self._log_file.write(event.to_json() + "\n")
-            self.event_count += 1
+        # Listener threads only enqueue the raw values (plus event time and window),
+        # formatting, serialization and disk I/O all happen on the writer thread.
+        # deque.append is atomic under the GIL, no lock on this path
+        self._event_dq.append((event_type, time.time_ns(), self._window_suffix, args))
+
+        # Only pay for Event.set() when the writer may be waiting
+        if not self._new_event.is_set():
+            self._new_event.set()
+
+    def _build_payload(self, event_type:str, args:tuple) -> Dict[str, Any]:
+        """Turn the raw listener arguments into the event data"""
+        if event_type == "mouse_move":
+            x, y = args
+            return {"x": x, "y": y}
+
+        if event_type == "mouse_click":
+            x, y, button, pressed = args
+            return {
+                "x": x,
+                "y": y,
+                "button": str(button),
+                "action": "pressed" if pressed else "released"
+            }
+
+        if event_type == "mouse_scroll":
+            x, y, dx, dy = args
+            return {"x": x, "y": y, "dx": dx, "dy": dy}
+
+        if event_type == "key_press":
+            key, = args
+            try:
+                key_str = key.char
+            except AttributeError:
+                key_str = str(key)
+            return {"key": key_str}
+
+        raise ValueError(f"Unknown event type: {event_type}")
+
+    def _serialize_event(self, event_type:str, ns:int, window_suffix:bytes, args:tuple) -> bytes:
+        # Same shape as Event: only the timestamp and the data are encoded per event,
+        # window fields are spliced in at the end of data
+        payload = self._build_payload(event_type, args)
+
+        if self.log_format == "msgpack":
+            # msgpack objects are self-delimiting, records are simply concatenated
+            return b"".join((
+                self._line_prefix,
+                msgpack.packb(self._fast_ts(ns)),
+                self._type_fragments[event_type],
+                _msgpack_map_header(len(payload) + len(_NO_WINDOW)),
+                msgpack.packb(payload)[1:],
+                window_suffix
+            ))
+
+        return b"".join((
+            self._line_prefix,
+            self._fast_ts(ns).encode(),
+            self._type_fragments[event_type],
+            orjson.dumps(payload)[:-1],
+            b",",
+            window_suffix,
+            b"}}\n"
+        ))
+
+    def _open_log(self, path) -> int:
+        # Raw append-only fd: one os.write per batch, no stdio buffer in between
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        return os.open(path, flags, 0o644)
+
+    def _prepare_next_log(self):
+        next_file = self.output_logs_dir / f"session_{uuid.uuid4()}{_LOG_SUFFIXES[self.log_format]}"
+        self._next_log = (next_file, self._open_log(next_file))
+
+    def _close_log(self, fd: int):
+        # Sync once when the file is done with, instead of on every batch
+        os.fsync(fd)
+        os.close(fd)
+
+    def _write_all(self, fd: int, data: bytes):
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+
+    def _write_batch(self, fd: int, batch: List[bytes]):
+        if not _IOV_MAX:
+            self._write_all(fd, b"".join(batch))
+            return
+
+        # Gather write straight from the event lines, no joined copy of the batch
+        for start in range(0, len(batch), _IOV_MAX):
+            chunk = batch[start:start + _IOV_MAX]
+            written = os.writev(fd, chunk)
+
+            # Short writes are rare, finish the rest of the chunk the slow way
+            if written < sum(map(len, chunk)):
+                self._write_all(fd, b"".join(chunk)[written:])
+
+    def _writer_loop(self):
+        """Drain queued events into the log file in batches"""
+        print("Writer started.")
+        batch = []
+        batch_started = 0.0
+        stopping = False
+
+        while not stopping:
+            try:
+                item = self._event_dq.popleft()
+            except IndexError:
+                item = ()
+                if batch:
+                    timeout = max(0.0, batch_started + self.writer_flush_interval - time.monotonic())
+                else:
+                    timeout = self.writer_flush_interval
+
+                # Clear before re-checking so an append racing with us still wakes the wait
+                self._new_event.clear()
+                if not self._event_dq:
+                    self._new_event.wait(timeout)
+
+            if item is None:
+                # stop() sentinel, write the remaining batch and exit
+                stopping = True
+            elif item:
+                try:
+                    line = self._serialize_event(*item)
+                except Exception as e:
+                    print("Writer dropped an event:", e)
+                else:
+                    if not batch:
+                        batch_started = time.monotonic()
+                    batch.append(line)
+
+            if not batch:
+                continue
+
+            if (stopping
+                    or len(batch) >= self.writer_batch_size
+                    or time.monotonic() - batch_started >= self.writer_flush_interval):
+                # Lock is shared only with the file rotation in _upload_scheduler
+                with self._lock:
+                    self._write_batch(self._log_fd, batch)
+                    self.event_count += len(batch)
+                batch = []
+
+        print("Writer stopped.")
 
     # mouse handlers
     def _on_mouse_move(self, x, y):
-        now = time.time()
+        ns = time.monotonic_ns()
 
         # store last cursor position
         self._last_cursor_pos = (x,y)
 
-        if(now - self._last_mouse_time) * 1000 < self.mouse_throttle_ms:
+        # Throttle here rather than on the writer, so dropped moves never touch the queue
+        if ns - self._last_mouse_ns < self._throttle_ns:
             return
         
-        self._last_mouse_time = now
+        self._last_mouse_ns = ns
 
-        self._write_event("mouse_move", {
-            "x": x,
-            "y": y
-        })
+        self._write_event("mouse_move", x, y)
 
 
     def _on_mouse_click(self, x, y, button, pressed):
-        self._write_event("mouse_click", {
-            "x": x,
-            "y": y,
-            "button": str(button),
-            "action": "pressed" if pressed else "released"
-        })
+        self._write_event("mouse_click", x, y, button, pressed)
     
     def _on_mouse_scroll(self, x, y, dx, dy):
-        self._write_event("mouse_scroll", {
-            "x": x,
-            "y": y,
-            "dx": dx,
-            "dy": dy
-        })
+        self._write_event("mouse_scroll", x, y, dx, dy)
 
 
     # keyboard handlers 
     def _on_key_press(self, key):
-        try:
-            key_str = key.char
-        except AttributeError:
-            key_str = str(key)
-        
-        self._write_event("key_press", {"key": key_str})
+        self._write_event("key_press", key)
 
     # Removing because we don't need key_release event at the moment 
     # def _on_key_release(self, key):
-    #     try:
-    #         key_str = key.char
-    #     except AttributeError:
-    #         key_str = str(key)
-
-    #     self._write_event("key_release", {"key": key_str})
+    #     self._write_event("key_release", key)
     
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+import importlib
+import sys
+import types
+from unittest import mock
+
+import pytest
+
+
+def _stub_if_unavailable(name, **attrs):
+    """pygetwindow only works on Windows and pynput needs a display, stub them elsewhere"""
+    try:
+        importlib.import_module(name)
+    except Exception:
+        sys.modules[name] = types.SimpleNamespace(**attrs)
+
+
+_stub_if_unavailable("pygetwindow", getActiveWindow=lambda: None)
+_stub_if_unavailable(
+    "pynput",
+    mouse=types.SimpleNamespace(Listener=mock.Mock),
+    keyboard=types.SimpleNamespace(Listener=mock.Mock),
+)
+
+from extractor import basic_logger  # noqa: E402
+from extractor.basic_logger import ActivityObserver  # noqa: E402
+
+FOREGROUND_HWND = 42
+OTHER_HWND = 7
+
+
+@pytest.fixture
+def observer(tmp_path):
+    observer = ActivityObserver(
+        output_logs_dir=tmp_path / "logs",
+        output_screenshots_dir=tmp_path / "screenshots",
+    )
+    observer._refresh_window = mock.Mock()
+    return observer
+
+
+@pytest.fixture
+def user32():
+    user32 = mock.Mock()
+    user32.GetForegroundWindow.return_value = FOREGROUND_HWND
+    return user32
+
+
+def test_foreground_change_always_refreshes(observer, user32):
+    observer._on_win_event(user32, basic_logger._EVENT_SYSTEM_FOREGROUND, OTHER_HWND, -4)
+
+    observer._refresh_window.assert_called_once()
+
+
+@pytest.mark.parametrize("event", [
+    basic_logger._EVENT_OBJECT_LOCATIONCHANGE,
+    basic_logger._EVENT_OBJECT_NAMECHANGE,
+])
+def test_foreground_window_change_refreshes(observer, user32, event):
+    observer._on_win_event(user32, event, FOREGROUND_HWND, basic_logger._OBJID_WINDOW)
+
+    observer._refresh_window.assert_called_once()
+
+
+@pytest.mark.parametrize("event", [
+    basic_logger._EVENT_OBJECT_LOCATIONCHANGE,
+    basic_logger._EVENT_OBJECT_NAMECHANGE,
+])
+@pytest.mark.parametrize("hwnd, id_object", [
+    (OTHER_HWND, basic_logger._OBJID_WINDOW),  # background window
+    (FOREGROUND_HWND, -9),                     # cursor/caret/child object of the foreground window
+])
+def test_other_object_change_is_ignored(observer, user32, event, hwnd, id_object):
+    observer._on_win_event(user32, event, hwnd, id_object)
+
+    observer._refresh_window.assert_not_called()
+
+
+def test_drag_refreshes_once_when_it_ends(observer, user32):
+    observer._on_win_event(user32, basic_logger._EVENT_SYSTEM_MOVESIZESTART, FOREGROUND_HWND, 0)
+    for _ in range(10):
+        observer._on_win_event(user32, basic_logger._EVENT_OBJECT_LOCATIONCHANGE, FOREGROUND_HWND, 0)
+
+    observer._refresh_window.assert_not_called()
+
+    observer._on_win_event(user32, basic_logger._EVENT_SYSTEM_MOVESIZEEND, FOREGROUND_HWND, 0)
+
+    observer._refresh_window.assert_called_once()
+
+
+def test_title_change_during_drag_still_refreshes(observer, user32):
+    observer._on_win_event(user32, basic_logger._EVENT_SYSTEM_MOVESIZESTART, FOREGROUND_HWND, 0)
+    observer._on_win_event(user32, basic_logger._EVENT_OBJECT_NAMECHANGE, FOREGROUND_HWND, 0)
+
+    observer._refresh_window.assert_called_once()
+
+
+def test_focus_change_ends_a_drag(observer, user32):
+    observer._on_win_event(user32, basic_logger._EVENT_SYSTEM_MOVESIZESTART, FOREGROUND_HWND, 0)
+    observer._on_win_event(user32, basic_logger._EVENT_SYSTEM_FOREGROUND, OTHER_HWND, 0)
+    observer._refresh_window.reset_mock()
+
+    observer._on_win_event(user32, basic_logger._EVENT_OBJECT_LOCATIONCHANGE, FOREGROUND_HWND, 0)
+
+    observer._refresh_window.assert_called_once()
+
+
+def test_refresh_errors_are_swallowed(observer, user32):
+    observer._refresh_window.side_effect = RuntimeError("window vanished")
+
+    observer._on_win_event(user32, basic_logger._EVENT_SYSTEM_FOREGROUND, FOREGROUND_HWND, 0)
+
+
+@pytest.mark.parametrize("log_format", ["jsonl", "msgpack"])
+def test_presign_request_names_the_log_format(tmp_path, log_format):
+    observer = ActivityObserver(
+        output_logs_dir=tmp_path / "logs",
+        output_screenshots_dir=tmp_path / "screenshots",
+        log_format=log_format,
+    )
+    observer.session = mock.Mock(username="user", session_id="sid")
+    observer._http = mock.Mock()
+    observer._http.post.return_value = mock.Mock(status_code=500, text="")
+
+    file_path = tmp_path / f"session_sid.{log_format}.gz"
+    file_path.write_bytes(b"")
+    observer._upload_file(file_path)
+
+    payload = observer._http.post.call_args.kwargs["json"]
+    assert payload["format"] == log_format
+    assert payload["file_name"] == file_path.name